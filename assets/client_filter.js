@@ -0,0 +1,99 @@
+// Client-side filtering for dash_app.py: recomputes the KPIs and charts from the
+// pre-aggregated slice in the 'client-slice' store, skipping the server round trip.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    clientFilter: {
+        updateCharts: function(startDate, endDate, slice, chartRequest,
+                               topProductsFigure, salesByCountryFigure, salesTrendFigure,
+                               pieFigure, salesComparisonFigure) {
+            const noUpdate = window.dash_clientside.no_update;
+            const country = slice ? slice.country : null;
+
+            // No client-side slice for this country: let the server query the database
+            if (!slice || slice.server_side) {
+                const request = {start_date: startDate, end_date: endDate, country: country};
+                const unchanged = chartRequest && chartRequest.start_date === request.start_date &&
+                    chartRequest.end_date === request.end_date && chartRequest.country === request.country;
+                return Array(8).fill(noUpdate).concat([unchanged ? noUpdate : request]);
+            }
+
+            // Same bounds as the server's "invoice_date BETWEEN start AND end"
+            const start = startDate.length === 10 ? startDate + ' 00:00:00' : startDate;
+            const end = endDate.length === 10 ? endDate + ' 00:00:00' : endDate;
+            const inRange = slice.times.map(time => time >= start && time <= end);
+
+            let totalSales = 0;
+            let totalOrders = 0;
+            let totalItems = 0;
+            const productQuantity = new Map();
+            const productSales = new Map();
+            const salesByTime = new Map();
+            const salesByMonth = new Map();
+
+            slice.orders.forEach((orders, i) => {
+                if (inRange[i]) {
+                    totalOrders += orders;
+                }
+            });
+
+            slice.time_index.forEach((t, row) => {
+                if (!inRange[t]) {
+                    return;
+                }
+                const time = slice.times[t];
+                const month = time.slice(0, 7) + '-01';
+                const product = slice.products[slice.product_index[row]];
+                const quantity = slice.quantity[row];
+                const sales = slice.total_sales[row];
+
+                totalSales += sales;
+                totalItems += quantity;
+                productQuantity.set(product, (productQuantity.get(product) || 0) + quantity);
+                productSales.set(product, (productSales.get(product) || 0) + sales);
+                salesByTime.set(time, (salesByTime.get(time) || 0) + sales);
+                salesByMonth.set(month, (salesByMonth.get(month) || 0) + sales);
+            });
+
+            const top10 = map => Array.from(map.entries()).sort((a, b) => b[1] - a[1]).slice(0, 10);
+            const byKey = map => Array.from(map.entries()).sort((a, b) => (a[0] < b[0] ? -1 : 1));
+
+            // Replace only the data arrays of the current figures; layouts stay as they are
+            const withData = (figure, keys, entries) => {
+                const updated = JSON.parse(JSON.stringify(figure));
+                updated.data[0][keys[0]] = entries.map(entry => entry[0]);
+                updated.data[0][keys[1]] = entries.map(entry => entry[1]);
+                return updated;
+            };
+
+            const topProducts = withData(topProductsFigure, ['x', 'y'], top10(productQuantity));
+            const salesByCountry = withData(salesByCountryFigure, ['x', 'y'], [[country, totalSales]]);
+            const pie = withData(pieFigure, ['labels', 'values'], top10(productSales));
+            const salesComparison = withData(salesComparisonFigure, ['x', 'y'], byKey(salesByMonth));
+
+            const trend = byKey(salesByTime);
+            const salesTrend = withData(salesTrendFigure, ['x', 'y'], trend);
+            const annotation = salesTrend.layout.annotations[0];
+            annotation.visible = trend.length > 0;
+            if (trend.length > 0) {
+                const peak = trend.reduce((best, entry) => (entry[1] > best[1] ? entry : best));
+                annotation.x = peak[0];
+                annotation.y = peak[1];
+            }
+
+            const formatNumber = (value, digits) => value.toLocaleString('en-US', {
+                minimumFractionDigits: digits, maximumFractionDigits: digits
+            });
+
+            return [
+                '$' + formatNumber(totalSales, 2),
+                formatNumber(totalOrders, 0),
+                formatNumber(totalItems, 0),
+                topProducts,
+                salesByCountry,
+                salesTrend,
+                pie,
+                salesComparison,
+                noUpdate
+            ];
+        }
+    }
+});
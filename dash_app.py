@@ -1,8 +1,19 @@
+# Requires Dash >= 2.16: Patch and allow_duplicate (2.9+) and a bundled plotly.js that
+# decodes base64 typed arrays ('bdata', plotly.js 2.28+).
+# Optional: flask-compress (pip install "dash[compress]") for gzip/brotli callback responses,
+# and orjson, which plotly's JSON encoder picks up automatically when installed.
+import base64
+import importlib.util
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
 import dash
-from dash import dcc, html
+from dash import dcc, html, Patch
 import dash_bootstrap_components as dbc
+import numpy as np
 import pandas as pd
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output, State
 from sqlalchemy import create_engine
 
 # Connect to PostgreSQL
@@ -17,15 +28,156 @@ PORT = '5432'
 engine = create_engine(f'{DATABASE_TYPE}+{DBAPI}://{USER}:{PASSWORD}@{HOST}:{PORT}/{DATABASE}')
 
 # Function to load data from PostgreSQL
-def load_data(query):
+# (raise_errors=True re-raises instead, so cached lookups never store a failed query)
+def load_data(query, raise_errors=False):
     try:
         return pd.read_sql(query, engine)
     except Exception as e:
         print(f"Error loading data: {e}")
+        if raise_errors:
+            raise
         return pd.DataFrame()  # Return an empty DataFrame in case of an error
 
-# Create Dash app
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.FLATLY])
+# Encode a numeric column as a plotly.js base64 typed array ('f8' = float64, 'i4' = int32)
+def typed_array(values, dtype='f8'):
+    array = np.ascontiguousarray(pd.Series(values).fillna(0), dtype=np.dtype(dtype).newbyteorder('<'))
+    return {'dtype': dtype, 'bdata': base64.b64encode(array.tobytes()).decode('ascii')}
+
+# Format a datetime column as compact strings instead of full ISO timestamps
+def date_strings(values, fmt='%Y-%m-%d %H:%M:%S'):
+    return pd.to_datetime(values).dt.strftime(fmt).tolist()
+
+# Static chart styles: sent once with the page layout and kept client-side.
+# update_charts only patches the data arrays of these figures.
+TOP_PRODUCTS_COLORS = [f'rgba(255,{140 + i*10},0,1)' for i in range(10)]  # Gradient for Top-Selling Products
+COUNTRY_COLORS = [f'rgba(255,{165 - i*10},0,1)' for i in range(50)]  # Gradient for Sales by Country
+PIE_COLORS = [
+    'rgba(255,140,0,1)', 'rgba(255,160,80,1)', 'rgba(255,180,120,1)', 'rgba(247, 202, 24, 1)', 'rgba(250, 190, 88, 1)',
+    'rgba(255,200,160,1)', 'rgba(255,220,200,1)', 'rgba(255,240,240,1)', 'rgba(245, 230, 83, 1)', 'rgba(251, 192, 147, 1)'
+]
+
+top_products_base_figure = {
+    'data': [{
+        'x': [],
+        'y': [],
+        'type': 'bar',
+        'marker': {
+            'color': TOP_PRODUCTS_COLORS
+        }
+    }],
+    'layout': {
+        'title': 'Top Selling Products',
+        'titlefont': {'size': 24},
+        'height': 400,
+        'margin': {'l': 60, 'r': 40, 't': 40, 'b': 40},
+        'hovermode': 'closest',
+        'yaxis': {'title': 'Total Products'}
+    }
+}
+
+sales_by_country_base_figure = {
+    'data': [{
+        'x': [],
+        'y': [],
+        'type': 'bar',
+        'marker': {
+            'color': COUNTRY_COLORS
+        }
+    }],
+    'layout': {
+        'title': 'Sales by Country',
+        'titlefont': {'size': 24},
+        'height': 400,
+        'margin': {'l': 60, 'r': 40, 't': 40, 'b': 40},
+        'hovermode': 'closest',
+        'yaxis': {'title': 'Total Sales'}
+    }
+}
+
+sales_trend_base_figure = {
+    'data': [{
+        'x': [],
+        'y': [],
+        'type': 'scatter',
+        'mode': 'lines',
+        'line': {
+            'color': 'rgba(255,140,0,1)',
+            'width': 2.5
+        }
+    }],
+    'layout': {
+        'title': 'Sales Trend Over Time',
+        'titlefont': {'size': 24},
+        'annotations': [{
+            'x': None,
+            'y': None,
+            'xref': 'x',
+            'yref': 'y',
+            'text': 'Peak Sales',
+            'showarrow': True,
+            'arrowhead': 2,
+            'ax': 0,
+            'ay': -40,
+            'visible': False
+        }],
+        'height': 400,
+        'margin': {'l': 60, 'r': 40, 't': 40, 'b': 40},
+        'hovermode': 'closest',
+        'yaxis': {'title': 'Total Sales'}
+    }
+}
+
+pie_base_figure = {
+    'data': [{
+        'labels': [],
+        'values': [],
+        'type': 'pie',
+        'hole': 0.4,
+        'marker': {
+            'colors': PIE_COLORS
+        }
+    }],
+    'layout': {
+        'title': 'Top Product Sales Distribution',
+        'titlefont': {'size': 24},
+        'height': 400,
+        'margin': {'l': 20, 'r': 40, 't': 40, 'b': 40}
+    }
+}
+
+sales_comparison_base_figure = {
+    'data': [{
+        'x': [],
+        'y': [],
+        'type': 'scatter',
+        'mode': 'lines+markers',
+        'line': {
+            'color': 'rgba(247, 202, 24, 1)',
+            'width': 3},
+        'hovertemplate': '<b>%{x}</b><br>Total Sales: $%{y:.2f}<extra></extra>'
+     }],
+    'layout': {
+        'title': 'Month-over-Month Sales Trends',
+        'titlefont': {'size': 24},
+        'height': 400,
+        'margin': {'l': 60, 'r': 40, 't': 40, 'b': 40},
+        'hovermode': 'closest',
+        'yaxis': {'title': 'Total Sales'}
+    }
+}
+
+# Default date range of the date picker (also the first chart request and a warmed combination)
+DEFAULT_START_DATE = '2010-12-01'
+DEFAULT_END_DATE = '2011-12-09'
+
+# Client-side filtering: when a single country is selected and its pre-aggregated slice is
+# small enough, the slice is sent to the browser once and date changes are filtered there
+CLIENT_SIDE_FILTERING = True
+CLIENT_SLICE_MAX_ROWS = 20000  # Larger slices fall back to server-side queries
+
+# Create Dash app (gzip/brotli-encode callback responses when flask-compress is installed)
+COMPRESS_RESPONSES = importlib.util.find_spec('flask_compress') is not None
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.FLATLY], compress=COMPRESS_RESPONSES)
 
 # Dashboard layout
 app.layout = dbc.Container([
@@ -48,8 +200,8 @@ app.layout = dbc.Container([
                     html.H5("Pick a Date Range", className="text-center text-secondary mb-2"),
                     dcc.DatePickerRange(
                         id='date-picker',
-                        start_date='2010-12-01',
-                        end_date='2011-12-09',
+                        start_date=DEFAULT_START_DATE,
+                        end_date=DEFAULT_END_DATE,
                         display_format='YYYY-MM-DD',
                         className='mb-4 d-flex justify-content-center',
                         style={'padding': '10px', 'textAlign': 'center'}
@@ -111,7 +263,7 @@ app.layout = dbc.Container([
                 html.P("This bar chart highlights the top 10 products based on quantity sold.", className="text-muted text-center mb-2",
                        style={"font-style": "italic", "font-family": "Lato, sans-serif"}),
                 dbc.CardBody([
-                    dcc.Graph(id='top-products-chart')
+                    dcc.Graph(id='top-products-chart', figure=top_products_base_figure)
                 ])
             ], style={'boxShadow': '0 4px 8px rgba(0,0,0,0.2)', 'borderRadius': '10px', 'backgroundColor': '#FEF3EC'}), width=6),
         dbc.Col(
@@ -121,7 +273,7 @@ app.layout = dbc.Container([
                 html.P("This chart provides a breakdown of total sales by country.", className="text-muted text-center mb-2",
                        style={"font-style": "italic", "font-family": "Lato, sans-serif"}),
                 dbc.CardBody([
-                    dcc.Graph(id='sales-by-country-chart')
+                    dcc.Graph(id='sales-by-country-chart', figure=sales_by_country_base_figure)
                 ])
             ], style={'boxShadow': '0 4px 8px rgba(0,0,0,0.2)', 'borderRadius': '10px', 'backgroundColor': '#FEF3EC'}), width=6)
     ], className="mb-4"),
@@ -133,7 +285,7 @@ app.layout = dbc.Container([
                 html.P("This line chart shows how sales have varied over time within the selected range.", className="text-muted text-center mb-2",
                        style={"font-style": "italic", "font-family": "Lato, sans-serif"}),
                 dbc.CardBody([
-                    dcc.Graph(id='sales-trend-chart')
+                    dcc.Graph(id='sales-trend-chart', figure=sales_trend_base_figure)
                 ])
             ], style={'boxShadow': '0 4px 8px rgba(0,0,0,0.2)', 'borderRadius': '10px', 'backgroundColor': '#FEF3EC'}), width=6),
         dbc.Col(
@@ -143,7 +295,7 @@ app.layout = dbc.Container([
             html.P("This line chart compares sales trends month-over-month.", className="text-muted text-center mb-2",
                    style={"font-style": "italic", "font-family": "Lato, sans-serif"}),
             dbc.CardBody([
-                dcc.Graph(id='sales-comparison-chart')
+                dcc.Graph(id='sales-comparison-chart', figure=sales_comparison_base_figure)
             ])
         ], style={'boxShadow': '0 4px 8px rgba(0,0,0,0.2)', 'borderRadius': '10px', 'backgroundColor': '#FEF3EC'}),
         width=6
@@ -157,20 +309,35 @@ app.layout = dbc.Container([
             html.P("This pie chart displays the distribution of sales among the top 10 products.", className="text-muted text-center mb-2",
                    style={"font-style": "italic", "font-family": "Lato, sans-serif"}),
             dbc.CardBody([
-                dcc.Graph(id='product-sales-pie-chart')
+                dcc.Graph(id='product-sales-pie-chart', figure=pie_base_figure)
             ])
         ], style={'boxShadow': '0 4px 8px rgba(0,0,0,0.2)', 'borderRadius': '10px', 'backgroundColor': '#FEF3EC'}),
             width=12, className="mt-2"),
-    ], className="mb-4")
+    ], className="mb-4"),
+    # Pre-aggregated slice for client-side filtering, and the filters the server should query
+    dcc.Store(id='client-slice'),
+    dcc.Store(id='chart-request', data={'start_date': DEFAULT_START_DATE, 'end_date': DEFAULT_END_DATE, 'country': None})
 ], fluid=True)
 
-# Callback for dropdown filters
-@app.callback(
-    Output('country-dropdown', 'options'),
-    [Input('date-picker', 'start_date'),
-     Input('date-picker', 'end_date')]
-)
-def update_country_dropdown(start_date, end_date):
+# Dashboard result caches (LRU), keyed by filter inputs; cleared and re-warmed after each ETL load
+CACHE_MAX_ENTRIES = 256  # Per cache; the least recently used entries are dropped first
+result_cache = OrderedDict()
+country_options_cache = OrderedDict()
+cache_lock = threading.Lock()
+cache_generation = 0  # Bumped on every clear, so queries started before a load aren't cached after it
+
+# Recent update_charts inputs, used to learn which filter combinations to precompute
+recent_inputs = deque(maxlen=500)
+
+# Filter combinations always precomputed after a load: (start_date, end_date, country or None for all)
+WARM_COMBINATIONS = [
+    (DEFAULT_START_DATE, DEFAULT_END_DATE, None),
+]
+WARM_RECENT_TOP_N = 10  # Also precompute the N most common combinations from recent_inputs
+WARM_POLL_SECONDS = 300  # How often the warmer checks etl_load_run for a new completed load
+
+# Query the country dropdown options for a date range
+def query_country_options(start_date, end_date):
     country_options_query = f"""
     SELECT DISTINCT c.country AS label, c.country AS value
     FROM fact_sales f
@@ -180,24 +347,10 @@ def update_country_dropdown(start_date, end_date):
         WHERE invoice_date BETWEEN '{start_date}' AND '{end_date}'
     )
     """
-    country_options = load_data(country_options_query).to_dict('records')
-    return country_options
+    return load_data(country_options_query, raise_errors=True).to_dict('records')
 
-# Callback for updating charts
-@app.callback(
-    [Output('total-sales-display', 'children'),
-     Output('total-orders-display', 'children'),
-     Output('total-items-display', 'children'),
-     Output('top-products-chart', 'figure'),
-     Output('sales-by-country-chart', 'figure'),
-     Output('sales-trend-chart', 'figure'),
-     Output('product-sales-pie-chart', 'figure'),
-     Output('sales-comparison-chart', 'figure')],
-    [Input('date-picker', 'start_date'),
-     Input('date-picker', 'end_date'),
-     Input('country-dropdown', 'value')]
-)
-def update_charts(start_date, end_date, selected_country):
+# Query the KPI displays and chart data for the selected filters
+def query_dashboard(start_date, end_date, selected_country):
     country_filter = f"AND c.country = '{selected_country}'" if selected_country else ""
 
     # Query total sales
@@ -211,7 +364,7 @@ def update_charts(start_date, end_date, selected_country):
     )
     {country_filter}
     """
-    total_sales = load_data(total_sales_query)
+    total_sales = load_data(total_sales_query, raise_errors=True)
 
     total_sales_display = f"${total_sales['total_sales'][0]:,.2f}" if not total_sales.empty else "$0.00"
 
@@ -226,7 +379,7 @@ def update_charts(start_date, end_date, selected_country):
     )
     {country_filter}
     """
-    total_orders = load_data(total_orders_query)
+    total_orders = load_data(total_orders_query, raise_errors=True)
     total_orders_display = f"{total_orders['total_orders'][0]:,}" if not total_orders.empty else "0"
 
     # Query total quantity sold
@@ -240,7 +393,7 @@ def update_charts(start_date, end_date, selected_country):
     )
     {country_filter}
     """
-    total_items = load_data(total_items_query)
+    total_items = load_data(total_items_query, raise_errors=True)
     total_items_display = f"{total_items['total_quantity'][0]:,}" if not total_items.empty else "0"
 
     # Query top-selling products (Top 10)
@@ -258,7 +411,7 @@ def update_charts(start_date, end_date, selected_country):
     ORDER BY total_quantity DESC
     LIMIT 10
     """
-    top_products = load_data(top_products_query)
+    top_products = load_data(top_products_query, raise_errors=True)
 
     # Query sales by country
     sales_by_country_query = f"""
@@ -273,7 +426,7 @@ def update_charts(start_date, end_date, selected_country):
     GROUP BY c.country
     ORDER BY total_sales DESC
     """
-    sales_by_country = load_data(sales_by_country_query)
+    sales_by_country = load_data(sales_by_country_query, raise_errors=True)
 
     # Query sales trend by date
     sales_trend_query = f"""
@@ -286,7 +439,7 @@ def update_charts(start_date, end_date, selected_country):
     GROUP BY t.invoice_date
     ORDER BY t.invoice_date
     """
-    sales_trend = load_data(sales_trend_query)
+    sales_trend = load_data(sales_trend_query, raise_errors=True)
 
     # Query sales distribution for the pie chart
     pie_chart_query = f"""
@@ -303,7 +456,7 @@ def update_charts(start_date, end_date, selected_country):
     ORDER BY total_sales DESC
     LIMIT 10  -- Limit to top 10 for better visibility
     """
-    pie_data = load_data(pie_chart_query)
+    pie_data = load_data(pie_chart_query, raise_errors=True)
 
     # Query month-over-month sales trends
     sales_comparison_query = f"""
@@ -316,133 +469,240 @@ def update_charts(start_date, end_date, selected_country):
     GROUP BY sales_month
     ORDER BY sales_month
     """
-    sales_comparison = load_data(sales_comparison_query)
-
-    # Generate gradient colors for Top-Selling Products (Green shades)
-    orange_colors = [f'rgba(255,{140 + i*10},0,1)' for i in range(len(top_products))]
-
-    # Top Products Figure
-    top_products_figure = {
-        'data': [{
-            'x': top_products['description'],
-            'y': top_products['total_quantity'],
-            'type': 'bar',
-            'marker': {
-                'color': orange_colors
-            }
-        }],
-        'layout': {
-            'title': 'Top Selling Products',
-            'titlefont': {'size': 24},
-            'height': 400,
-            'margin': {'l': 60, 'r': 40, 't': 40, 'b': 40},
-            'hovermode': 'closest',
-            'yaxis': {'title': 'Total Products'}
-        }
-    }
+    sales_comparison = load_data(sales_comparison_query, raise_errors=True)
 
-    # Generate gradient colors for Sales by Country (Red shades)
-    orange_colors_country = [f'rgba(255,{165 - i*10},0,1)' for i in range(len(sales_by_country))]
-
-    # Sales by Country Figure
-    sales_by_country_figure = {
-        'data': [{
-            'x': sales_by_country['country'],
-            'y': sales_by_country['total_sales'],
-            'type': 'bar',
-            'marker': {
-                'color': orange_colors_country
-            }
-        }],
-        'layout': {
-            'title': 'Sales by Country',
-            'titlefont': {'size': 24},
-            'height': 400,
-            'margin': {'l': 60, 'r': 40, 't': 40, 'b': 40},
-            'hovermode': 'closest',
-            'yaxis': {'title': 'Total Sales'}
-        }
-    }
+    return total_sales_display, total_orders_display, total_items_display, top_products, sales_by_country, sales_trend, pie_data, sales_comparison
 
-    # Sales Trend Figure
-    sales_trend_figure = {
-        'data': [{
-            'x': sales_trend['invoice_date'],
-            'y': sales_trend['total_sales'],
-            'type': 'scatter',
-            'mode': 'lines',
-            'line': {
-                'color': 'rgba(255,140,0,1)',
-                'width': 2.5
-            }
-        }],
-        'layout': {
-            'title': 'Sales Trend Over Time',
-            'titlefont': {'size': 24},
-            'annotations': [{
-            'x': sales_trend['invoice_date'][sales_trend['total_sales'].idxmax()],
-            'y': sales_trend['total_sales'].max(),
-            'xref': 'x',
-            'yref': 'y',
-            'text': 'Peak Sales',
-            'showarrow': True,
-            'arrowhead': 2,
-            'ax': 0,
-            'ay': -40
-        }],
-            'height': 400,
-            'margin': {'l': 60, 'r': 40, 't': 40, 'b': 40},
-            'hovermode': 'closest',
-            'yaxis': {'title': 'Total Sales'}
-        }
-    }
+# Query a compact, columnar slice of one country's sales, pre-aggregated by invoice date and product.
+# Returns None when the slice has more than CLIENT_SLICE_MAX_ROWS rows.
+def query_client_slice(country):
+    slice_query = f"""
+    SELECT t.invoice_date, p.description, SUM(f.quantity) AS quantity, SUM(f.total_amount) AS total_sales
+    FROM fact_sales f
+    JOIN dim_time t ON f.time_id = t.time_id
+    JOIN dim_product p ON f.product_id = p.product_id
+    JOIN dim_customer c ON f.customer_id = c.customer_id
+    WHERE c.country = '{country}'
+    GROUP BY t.invoice_date, p.description
+    LIMIT {CLIENT_SLICE_MAX_ROWS + 1}
+    """
+    slice_data = load_data(slice_query)
+    if slice_data.empty or len(slice_data) > CLIENT_SLICE_MAX_ROWS:
+        return None
 
-    # Pie Chart Figure
-    pie_figure = {
-        'data': [{
-            'labels': pie_data['description'],
-            'values': pie_data['total_sales'],
-            'type': 'pie',
-            'hole': 0.4,
-            'marker': {
-                'colors': [
-                    'rgba(255,140,0,1)', 'rgba(255,160,80,1)', 'rgba(255,180,120,1)', 'rgba(247, 202, 24, 1)', 'rgba(250, 190, 88, 1)',
-                    'rgba(255,200,160,1)', 'rgba(255,220,200,1)', 'rgba(255,240,240,1)', 'rgba(245, 230, 83, 1)', 'rgba(251, 192, 147, 1)'
-                ]
-            }
-        }],
-        'layout': {
-            'title': 'Top Product Sales Distribution',
-            'titlefont': {'size': 24},
-            'height': 400,
-            'margin': {'l': 20, 'r': 40, 't': 40, 'b': 40}
-        }
-    }
+    # Orders are counted per invoice date; an invoice has a single date, so these add up across a range
+    orders_query = f"""
+    SELECT t.invoice_date, COUNT(DISTINCT f.invoice_no) AS orders
+    FROM fact_sales f
+    JOIN dim_time t ON f.time_id = t.time_id
+    JOIN dim_customer c ON f.customer_id = c.customer_id
+    WHERE c.country = '{country}'
+    GROUP BY t.invoice_date
+    ORDER BY t.invoice_date
+    """
+    orders = load_data(orders_query)
 
-    # Sales Comparison Figure
-    sales_comparison_figure = {
-        'data': [{
-            'x': sales_comparison['sales_month'],
-            'y': sales_comparison['total_sales'],
-            'type': 'scatter',
-            'mode': 'lines+markers',
-            'line': {
-                'color': 'rgba(247, 202, 24, 1)',
-                'width': 3},
-            'hovertemplate': '<b>%{x}</b><br>Total Sales: $%{y:.2f}<extra></extra>'
-         }],
-        'layout': {
-            'title': 'Month-over-Month Sales Trends',
-            'titlefont': {'size': 24},
-            'height': 400,
-            'margin': {'l': 60, 'r': 40, 't': 40, 'b': 40},
-            'hovermode': 'closest',
-            'yaxis': {'title': 'Total Sales'}
-        }
+    # Dictionary-encode dates and descriptions so each row is just a few numbers
+    times = date_strings(orders['invoice_date'])
+    time_codes = pd.Categorical(date_strings(slice_data['invoice_date']), categories=times).codes
+    product_codes, products = pd.factorize(slice_data['description'])
+    return {
+        'country': country,
+        'times': times,
+        'orders': orders['orders'].astype(int).tolist(),
+        'products': products.tolist(),
+        'time_index': time_codes.tolist(),
+        'product_index': product_codes.tolist(),
+        'quantity': slice_data['quantity'].astype(int).tolist(),
+        'total_sales': slice_data['total_sales'].astype(float).round(2).tolist()
     }
 
+# LRU cache helpers; all reads and writes happen under cache_lock
+def cache_get(cache, key):
+    with cache_lock:
+        if key not in cache:
+            return None
+        cache.move_to_end(key)
+        return cache[key]
+
+def cache_set(cache, key, value, generation):
+    with cache_lock:
+        if generation != cache_generation:
+            return
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > CACHE_MAX_ENTRIES:
+            cache.popitem(last=False)
+
+def clear_caches():
+    global cache_generation
+    with cache_lock:
+        result_cache.clear()
+        country_options_cache.clear()
+        cache_generation += 1
+
+# Cached lookups used by the callbacks and the cache warmer
+def get_country_options(start_date, end_date):
+    key = (start_date, end_date)
+    options = cache_get(country_options_cache, key)
+    if options is None:
+        generation = cache_generation
+        try:
+            options = query_country_options(start_date, end_date)
+        except Exception:
+            return []  # Not cached, so the next request queries again
+        cache_set(country_options_cache, key, options, generation)
+    return options
+
+def get_dashboard_data(start_date, end_date, selected_country):
+    key = (start_date, end_date, selected_country)
+    results = cache_get(result_cache, key)
+    if results is None:
+        generation = cache_generation
+        results = query_dashboard(start_date, end_date, selected_country)  # Raises on a failed query, so nothing is cached
+        cache_set(result_cache, key, results, generation)
+    return results
+
+# Latest completed ETL run; etl.py commits in batches, so only completed runs trigger a re-warm.
+# Returns 0 while etl_load_run doesn't exist yet (warm once at startup) and None if the database is unavailable.
+def latest_completed_run():
+    ledger = load_data("SELECT to_regclass('etl_load_run') IS NOT NULL AS ledger_exists")
+    if ledger.empty:
+        return None
+    if not ledger['ledger_exists'][0]:
+        return 0
+    latest_run = load_data("SELECT COALESCE(MAX(run_id), 0) AS run_id FROM etl_load_run WHERE status = 'completed'")
+    return int(latest_run['run_id'][0]) if not latest_run.empty else None
+
+# Precompute configured and frequently used filter combinations
+def warm_cache():
+    combinations = list(WARM_COMBINATIONS)
+    for combination, _ in Counter(list(recent_inputs)).most_common(WARM_RECENT_TOP_N):
+        if combination not in combinations:
+            combinations.append(combination)
+
+    for start_date, end_date, country in combinations:
+        get_country_options(start_date, end_date)
+        try:
+            get_dashboard_data(start_date, end_date, country)
+        except Exception as e:
+            print(f"Error warming cache for {start_date} - {end_date}, {country}: {e}")
+    print(f"Cache warmed for {len(combinations)} filter combinations")
+
+# Background job: after each new load, drop stale results and re-warm the cache
+def cache_warmer():
+    last_run = None
+    while True:
+        run_id = latest_completed_run()
+        if run_id is not None and run_id != last_run:
+            clear_caches()
+            warm_cache()
+            last_run = run_id
+        time.sleep(WARM_POLL_SECONDS)
+
+def start_cache_warmer():
+    threading.Thread(target=cache_warmer, daemon=True).start()
+
+# Callback for dropdown filters
+@app.callback(
+    Output('country-dropdown', 'options'),
+    [Input('date-picker', 'start_date'),
+     Input('date-picker', 'end_date')]
+)
+def update_country_dropdown(start_date, end_date):
+    return get_country_options(start_date, end_date)
+
+# Callback for loading the client-side slice when the country changes. It always returns a value,
+# so the clientside callback below sees every country change exactly once; {'country': ..., 'server_side': True}
+# means the charts for that country are computed on the server.
+@app.callback(
+    Output('client-slice', 'data'),
+    Input('country-dropdown', 'value')
+)
+def update_client_slice(selected_country):
+    slice_data = None
+    if CLIENT_SIDE_FILTERING and selected_country:
+        slice_data = query_client_slice(selected_country)
+    return slice_data or {'country': selected_country, 'server_side': True}
+
+# Clientside callback: computes the charts in the browser when the selected country's slice
+# is loaded, otherwise passes the filters on to the server through 'chart-request'
+# (see assets/client_filter.js). The country is taken from the slice, not the dropdown.
+app.clientside_callback(
+    ClientsideFunction(namespace='clientFilter', function_name='updateCharts'),
+    [Output('total-sales-display', 'children', allow_duplicate=True),
+     Output('total-orders-display', 'children', allow_duplicate=True),
+     Output('total-items-display', 'children', allow_duplicate=True),
+     Output('top-products-chart', 'figure', allow_duplicate=True),
+     Output('sales-by-country-chart', 'figure', allow_duplicate=True),
+     Output('sales-trend-chart', 'figure', allow_duplicate=True),
+     Output('product-sales-pie-chart', 'figure', allow_duplicate=True),
+     Output('sales-comparison-chart', 'figure', allow_duplicate=True),
+     Output('chart-request', 'data')],
+    [Input('date-picker', 'start_date'),
+     Input('date-picker', 'end_date'),
+     Input('client-slice', 'data')],
+    [State('chart-request', 'data'),
+     State('top-products-chart', 'figure'),
+     State('sales-by-country-chart', 'figure'),
+     State('sales-trend-chart', 'figure'),
+     State('product-sales-pie-chart', 'figure'),
+     State('sales-comparison-chart', 'figure')],
+    prevent_initial_call=True
+)
+
+# Callback for updating charts on the server
+@app.callback(
+    [Output('total-sales-display', 'children'),
+     Output('total-orders-display', 'children'),
+     Output('total-items-display', 'children'),
+     Output('top-products-chart', 'figure'),
+     Output('sales-by-country-chart', 'figure'),
+     Output('sales-trend-chart', 'figure'),
+     Output('product-sales-pie-chart', 'figure'),
+     Output('sales-comparison-chart', 'figure')],
+    Input('chart-request', 'data')
+)
+def update_charts(chart_request):
+    start_date, end_date, selected_country = chart_request['start_date'], chart_request['end_date'], chart_request['country']
+    recent_inputs.append((start_date, end_date, selected_country))
+    (total_sales_display, total_orders_display, total_items_display,
+     top_products, sales_by_country, sales_trend, pie_data, sales_comparison) = get_dashboard_data(start_date, end_date, selected_country)
+
+    # Patch only the data arrays; layouts and colors stay client-side
+    top_products_figure = Patch()
+    top_products_figure['data'][0]['x'] = top_products['description'].tolist()
+    top_products_figure['data'][0]['y'] = typed_array(top_products['total_quantity'], 'i4')
+
+    sales_by_country_figure = Patch()
+    sales_by_country_figure['data'][0]['x'] = sales_by_country['country'].tolist()
+    sales_by_country_figure['data'][0]['y'] = typed_array(sales_by_country['total_sales'])
+
+    trend_dates = date_strings(sales_trend['invoice_date'])
+    sales_trend_figure = Patch()
+    sales_trend_figure['data'][0]['x'] = trend_dates
+    sales_trend_figure['data'][0]['y'] = typed_array(sales_trend['total_sales'])
+    if not sales_trend.empty:
+        peak = sales_trend['total_sales'].idxmax()
+        sales_trend_figure['layout']['annotations'][0]['x'] = trend_dates[peak]
+        sales_trend_figure['layout']['annotations'][0]['y'] = float(sales_trend['total_sales'][peak])
+    sales_trend_figure['layout']['annotations'][0]['visible'] = not sales_trend.empty
+
+    pie_figure = Patch()
+    pie_figure['data'][0]['labels'] = pie_data['description'].tolist()
+    pie_figure['data'][0]['values'] = typed_array(pie_data['total_sales'])
+
+    sales_comparison_figure = Patch()
+    sales_comparison_figure['data'][0]['x'] = date_strings(sales_comparison['sales_month'], '%Y-%m-%d')
+    sales_comparison_figure['data'][0]['y'] = typed_array(sales_comparison['total_sales'])
+
     return total_sales_display, total_orders_display, total_items_display, top_products_figure, sales_by_country_figure, sales_trend_figure, pie_figure, sales_comparison_figure
 
 # Run the app
 if __name__ == '__main__':
-    app.run_server(debug=True)
+    debug = True
+    # With the debug reloader, this block runs in both the file watcher and the serving child;
+    # only start the cache warmer where requests are actually served
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_cache_warmer()
+    app.run_server(debug=debug)
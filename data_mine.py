@@ -12,6 +12,7 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans
 import matplotlib.pyplot as plt
 from sqlalchemy import create_engine
+from data_types import read_sql_typed
 
 # Database connection configuration
 DATABASE_TYPE = 'postgresql'
@@ -36,7 +37,8 @@ JOIN dim_customer c ON f.customer_id = c.customer_id
 JOIN dim_time t ON f.time_id = t.time_id
 GROUP BY c.customer_id
 """
-df = pd.read_sql(query, engine)
+# Read in chunks with explicit dtypes to keep memory bounded
+df = read_sql_typed(query, engine, dtypes={'customer_id': 'int32', 'total_spent': 'float64', 'frequency': 'int32'})
 
 # Step 1.3: Preprocess the data
 # Calculate recency by subtracting the most recent purchase date from today
@@ -81,7 +83,7 @@ JOIN dim_time t ON f.time_id = t.time_id
 GROUP BY month
 ORDER BY month
 """
-sales_data = pd.read_sql(query, engine)
+sales_data = read_sql_typed(query, engine, dtypes={'total_sales': 'float64'})
 
 sales_data['month'] = pd.to_datetime(sales_data['month'])
 sales_data['month_number'] = sales_data['month'].dt.strftime('%Y%m').astype(int)
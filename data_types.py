@@ -0,0 +1,50 @@
+import pandas as pd
+
+# Shared data-typing helpers for etl.py and data_mine.py.
+# Repeated strings become categoricals (dictionary-encoded), integers are downcast,
+# and money columns are stored as fixed-point integers instead of float64.
+
+AMOUNT_SCALE = 1000  # Fixed-point amounts are stored in thousandths (unit prices go down to 0.001)
+SQL_CHUNKSIZE = 50000  # Rows per chunk when reading query results
+
+# Convert amounts to fixed-point int64 (e.g. 2.55 -> 2550)
+def to_fixed_point(values, scale=AMOUNT_SCALE):
+    return (values * scale).round().astype('int64')
+
+# Convert fixed-point amounts back to floats (e.g. for SQL inserts and reporting)
+def from_fixed_point(values, scale=AMOUNT_SCALE):
+    return values / scale
+
+# Convert df to compact dtypes (in place unless copy=True) and return it:
+# - columns listed in `categorical` become category
+# - columns listed in `fixed_point` become fixed-point int64
+# - float columns listed in `whole_number` (e.g. IDs after dropna) become downcast integers
+# - other integer columns are downcast, except those listed in `keep`
+def optimize_dtypes(df, categorical=(), fixed_point=(), whole_number=(), keep=(), copy=False):
+    if copy:
+        df = df.copy()
+    for column in df.columns:
+        values = df[column]
+        if column in categorical:
+            df[column] = values.astype('category')
+        elif column in fixed_point:
+            df[column] = to_fixed_point(values)
+        elif column in whole_number:
+            df[column] = pd.to_numeric(values.astype('int64'), downcast='integer')
+        elif column not in keep and pd.api.types.is_integer_dtype(values):
+            df[column] = pd.to_numeric(values, downcast='integer')
+    return df
+
+# Read a query in chunks over a server-side cursor (stream_results), so the driver fetches `chunksize`
+# rows at a time instead of buffering the whole result, and type each chunk as it arrives.
+# Columns given in `dtypes` keep exactly that dtype.
+def read_sql_typed(query, engine, dtypes=None, whole_number=(), chunksize=SQL_CHUNKSIZE):
+    dtypes = dtypes or {}
+    with engine.connect().execution_options(stream_results=True) as connection:
+        chunks = [
+            optimize_dtypes(chunk, whole_number=whole_number, keep=dtypes)
+            for chunk in pd.read_sql(query, connection, chunksize=chunksize, dtype=dtypes or None)
+        ]
+    if not chunks:
+        return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in dtypes.items()})
+    return pd.concat(chunks, ignore_index=True)
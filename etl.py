@@ -1,15 +1,25 @@
+import hashlib
 import pandas as pd
 from sqlalchemy import create_engine, text
+from data_types import AMOUNT_SCALE, optimize_dtypes
 
 # Load online retail dataset
-df = pd.read_excel(r'C:\Users\HP\Downloads\online+retail\Online_Retail.xlsx')
+SOURCE_FILE = r'C:\Users\HP\Downloads\online+retail\Online_Retail.xlsx'
+df = pd.read_excel(SOURCE_FILE)
+
+# Use compact dtypes right away: categorical strings, downcast integers and
+# fixed-point UnitPrice in thousandths
+df = optimize_dtypes(df, categorical=['InvoiceNo', 'StockCode', 'Description', 'Country'], fixed_point=['UnitPrice'])
 
 # Check the structure
 print(df.info())
 print(df.head())
 
 # Remove rows with missing CustomerID and InvoiceNo
-df_cleaned = df.dropna(subset=['CustomerID', 'InvoiceNo'])
+# (CustomerID is float64 until its NaNs are dropped, then becomes a downcast integer)
+# (UnitPrice stays int64 so TotalAmount can't overflow)
+df_cleaned = optimize_dtypes(df.dropna(subset=['CustomerID', 'InvoiceNo']), whole_number=['CustomerID'], keep=['UnitPrice'])
+del df  # Only the cleaned frame is needed from here on
 print(df_cleaned.info()) # Check if rows with missing values are removed
 
 # Remove duplicate rows
@@ -20,7 +30,9 @@ print(df_cleaned.info()) # Confirm duplicates are removed
 df_cleaned = df_cleaned[(df_cleaned['Quantity'] > 0) & (df_cleaned['UnitPrice'] > 0)]
 print(df_cleaned.describe()) # Check if invalid rows are removed
 
-# Create a 'TotalAmount' column
+print(df_cleaned.info(memory_usage='deep')) # Check the reduced memory footprint
+
+# Create a 'TotalAmount' column (fixed-point, same scale as UnitPrice)
 df_cleaned['TotalAmount'] = df_cleaned['Quantity'] * df_cleaned['UnitPrice']
 print(df_cleaned.head()) # Verify that the new column has been created correctly
 
@@ -28,6 +40,16 @@ print(df_cleaned.head()) # Verify that the new column has been created correctly
 df_cleaned['InvoiceDate'] = pd.to_datetime(df_cleaned['InvoiceDate'])
 print(df_cleaned.info()) # Ensure InvoiceDate is converted to datetime type
 
+# Idempotency key for fact_sales: a hash of the fact columns plus the line's occurrence number among
+# identical lines, so retried batches never insert duplicates. It only uses columns stored in
+# fact_sales, so rows loaded before the key existed can be backfilled with the same value in SQL.
+LINE_KEY_COLUMNS = ['InvoiceNo', 'CustomerID', 'StockCode', 'InvoiceDate', 'Quantity']
+df_cleaned['LineOccurrence'] = df_cleaned.groupby(LINE_KEY_COLUMNS, observed=True, sort=False).cumcount() + 1
+
+# Fingerprint of the source file, used to find an interrupted run of the same load
+with open(SOURCE_FILE, 'rb') as source:
+    source_fingerprint = hashlib.sha256(source.read()).hexdigest()
+
 # Database connection
 DATABASE_TYPE = 'postgresql'
 DBAPI = 'psycopg2'
@@ -37,142 +59,254 @@ PASSWORD = 'admin'
 DATABASE = 'retail_db'
 PORT = '5432'
 
+BATCH_SIZE = 1000  # fact_sales rows per committed batch
+BACKFILL_INVOICES = 1000  # Invoices per committed batch when backfilling line_key on existing rows
+
 engine = create_engine(f'{DATABASE_TYPE}+{DBAPI}://{USER}:{PASSWORD}@{HOST}:{PORT}/{DATABASE}')
-connection = engine.connect()
 
-# Begin a transaction
-transaction = connection.begin()
+# Create the load-run ledger if it doesn't exist yet
+with engine.begin() as connection:
+    connection.execute(text("""
+    CREATE TABLE IF NOT EXISTS etl_load_run (
+        run_id SERIAL PRIMARY KEY,
+        source_file TEXT NOT NULL,
+        source_fingerprint TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'running',  -- running, failed or completed
+        dimensions_loaded BOOLEAN NOT NULL DEFAULT FALSE,
+        last_row INTEGER NOT NULL DEFAULT 0,  -- cleaned rows committed to fact_sales so far
+        started_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        finished_at TIMESTAMP
+    );
+    """))
+
+# Add the fact_sales idempotency key (line_key) only where it is missing, so regular loads
+# take no locks on fact_sales and do no full-table work here
+with engine.connect() as connection:
+    line_key_column = connection.execute(text("""
+    SELECT is_nullable FROM information_schema.columns
+    WHERE table_name = 'fact_sales' AND column_name = 'line_key'
+    """)).fetchone()
+    line_key_index = connection.execute(text("""
+    SELECT 1 FROM pg_indexes
+    WHERE tablename = 'fact_sales' AND indexname = 'fact_sales_line_key_idx'
+    """)).fetchone()
+
+if not line_key_column:
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE fact_sales ADD COLUMN line_key TEXT;"))
+
+if not line_key_column or line_key_column[0] == 'YES':
+    # Backfill keys for rows loaded before line_key existed, matching the keys computed below.
+    # Whole invoices are keyed per batch (identical lines always share an invoice), one commit per batch.
+    backfilled = 0
+    while True:
+        with engine.begin() as connection:
+            batch_rows = connection.execute(text(f"""
+            UPDATE fact_sales f
+            SET line_key = k.line_key
+            FROM (
+                SELECT ctid AS row_id,
+                       md5(concat_ws('|', invoice_no, customer_id, product_id, time_id, quantity,
+                           ROW_NUMBER() OVER (PARTITION BY invoice_no, customer_id, product_id, time_id, quantity
+                                              ORDER BY ctid))) AS line_key
+                FROM fact_sales
+                WHERE invoice_no IN (
+                    SELECT DISTINCT invoice_no FROM fact_sales
+                    WHERE line_key IS NULL
+                    LIMIT {BACKFILL_INVOICES}
+                )
+            ) k
+            WHERE f.ctid = k.row_id AND f.line_key IS NULL;
+            """)).rowcount
+        if not batch_rows:
+            break
+        backfilled += batch_rows
+        print(f"Backfilled line_key for {backfilled} existing fact_sales rows")
+
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE fact_sales ALTER COLUMN line_key SET NOT NULL;"))
+
+if not line_key_index:
+    with engine.begin() as connection:
+        connection.execute(text("CREATE UNIQUE INDEX fact_sales_line_key_idx ON fact_sales (line_key);"))
+
+# Resume the latest unfinished run of this source file, or start a new one
+with engine.begin() as connection:
+    completed_run = connection.execute(text(f"""
+    SELECT run_id FROM etl_load_run
+    WHERE source_fingerprint = '{source_fingerprint}' AND status = 'completed'
+    """)).fetchone()
+    unfinished_run = connection.execute(text(f"""
+    SELECT run_id, dimensions_loaded, last_row FROM etl_load_run
+    WHERE source_fingerprint = '{source_fingerprint}' AND status <> 'completed'
+    ORDER BY run_id DESC
+    LIMIT 1
+    """)).fetchone()
+
+    if completed_run:
+        print(f"Source file already loaded by run {completed_run[0]}, nothing to do.")
+        raise SystemExit(0)
+
+    if unfinished_run:
+        run_id, dimensions_loaded, last_row = unfinished_run
+        connection.execute(text(f"UPDATE etl_load_run SET status = 'running' WHERE run_id = {run_id};"))
+        print(f"Resuming run {run_id} after row {last_row}")
+    else:
+        source_file = SOURCE_FILE.replace("'", "''")
+        run_id = connection.execute(text(f"""
+        INSERT INTO etl_load_run (source_file, source_fingerprint)
+        VALUES ('{source_file}', '{source_fingerprint}')
+        RETURNING run_id;
+        """)).scalar()
+        dimensions_loaded, last_row = False, 0
+        print(f"Starting run {run_id}")
+
+connection = engine.connect()
 
 try:
-    # Populate dim_customer
-    customers = df_cleaned[['CustomerID', 'Country']].drop_duplicates()
-    customers.columns = ['customer_id', 'country']
-
-    for index, row in customers.iterrows():
-        customer_id = int(row['customer_id'])  # Ensure it's an integer
-        country = row['country'].replace("'", "''")  # Escape single quotes
-        
-        # Log every 100 rows only
-        if index % 100 == 0:
-            print(f"Inserting customer_id: {customer_id}, country: {country}")
-        
-        # SQL query to insert or update customer record
-        sql_query = f"""
-        INSERT INTO dim_customer (customer_id, country)
-        VALUES ({customer_id}, '{country}')
-        ON CONFLICT (customer_id) DO UPDATE
-        SET country = '{country}';
-        """
-        
-        connection.execute(text(sql_query))
-
-    # Populate dim_product
-    products = df_cleaned[['StockCode', 'Description', 'UnitPrice']].drop_duplicates()
-    products.columns = ['product_id', 'description', 'unit_price']
-
-    for index, row in products.iterrows():
-        product_id = row['product_id']
-        description = row['description'].replace("'", "''")  # Escape single quotes
-        unit_price = row['unit_price']
-        
-        # Log every 100 rows only
-        if index % 100 == 0:
-            print(f"Inserting product_id: {product_id}, description: {description}, unit_price: {unit_price}")
-
-        sql_query = f"""
-        INSERT INTO dim_product (product_id, description, unit_price)
-        VALUES ('{product_id}', '{description}', {unit_price})
-        ON CONFLICT (product_id) DO UPDATE
-        SET description = '{description}', unit_price = {unit_price};
-        """
-        
-        connection.execute(text(sql_query))
-
-    # Populate dim_time 
-    df_cleaned['InvoiceYear'] = df_cleaned['InvoiceDate'].dt.year
-    df_cleaned['InvoiceMonth'] = df_cleaned['InvoiceDate'].dt.month
-    time_dim = df_cleaned[['InvoiceDate', 'InvoiceMonth', 'InvoiceYear']].drop_duplicates()
-    time_dim.columns = ['invoice_date', 'month', 'year']
-
-    for index, row in time_dim.iterrows():
-        invoice_date = row['invoice_date']
-        month = row['month']
-        year = row['year']
-        
-        # Log every 100 rows only
-        if index % 100 == 0:
-            print(f"Inserting invoice_date: {invoice_date}, month: {month}, year: {year}")
-
-        sql_query = f"""
-        INSERT INTO dim_time (invoice_date, month, year)
-        VALUES ('{invoice_date}', {month}, {year})
-        ON CONFLICT (invoice_date) DO UPDATE
-        SET month = {month}, year = {year};
-        """
-        
-        connection.execute(text(sql_query))
-
-    #  Populate fact_sales
-    fact_sales_rows = []
-
-    for index, row in df_cleaned.iterrows():
-        invoice_no = row['InvoiceNo']
-        customer_id = int(row['CustomerID'])
-        product_id = row['StockCode']
-        invoice_date = row['InvoiceDate']
-        quantity = row['Quantity']
-        total_amount = row['TotalAmount']
-
-        # Get the time_id from dim_time based on invoice_date
-        time_query = f"SELECT time_id FROM dim_time WHERE invoice_date = '{invoice_date}'"
-        time_id = connection.execute(text(time_query)).fetchone()
-
-        if not time_id:
-            print(f"Time ID not found for invoice_date: {invoice_date}")
-            continue
-
-        # Check if customer and product exist in respective dimension tables
-        customer_query = f"SELECT customer_id FROM dim_customer WHERE customer_id = {customer_id}"
-        customer_result = connection.execute(text(customer_query)).fetchone()
-
-        product_query = f"SELECT product_id FROM dim_product WHERE product_id = '{product_id}'"
-        product_result = connection.execute(text(product_query)).fetchone()
-
-        if not (customer_result and product_result):
-            print(f"Customer or Product not found for: CustomerID {customer_id}, ProductID {product_id}")
-            continue
-
-        # Prepare the data for batch insert
-        fact_sales_rows.append(
-            f"('{invoice_no}', {customer_id}, '{product_id}', {time_id[0]}, {quantity}, {total_amount})"
-        )
-
-        # Insert in batches of 100 rows
-        if len(fact_sales_rows) == 100:
-            sql_query = f"""
-            INSERT INTO fact_sales (invoice_no, customer_id, product_id, time_id, quantity, total_amount)
-            VALUES {', '.join(fact_sales_rows)};
-            """
-            connection.execute(text(sql_query))
-            print(f"Inserted batch of 100 rows into fact_sales")
-            fact_sales_rows = []  # Clear the batch
-
-    # Insert remaining rows if there are any left
-    if fact_sales_rows:
-        sql_query = f"""
-        INSERT INTO fact_sales (invoice_no, customer_id, product_id, time_id, quantity, total_amount)
-        VALUES {', '.join(fact_sales_rows)};
-        """
-        connection.execute(text(sql_query))
-        print(f"Inserted final batch into fact_sales")
-
-    # Commit the transaction
-    transaction.commit()
+    # Dimension upserts are idempotent; they are committed together with the ledger flag
+    if not dimensions_loaded:
+        with connection.begin():
+            # Populate dim_customer
+            customers = df_cleaned[['CustomerID', 'Country']].drop_duplicates()
+            customers.columns = ['customer_id', 'country']
+
+            for index, row in customers.iterrows():
+                customer_id = int(row['customer_id'])  # Ensure it's an integer
+                country = row['country'].replace("'", "''")  # Escape single quotes
+
+                # Log every 100 rows only
+                if index % 100 == 0:
+                    print(f"Inserting customer_id: {customer_id}, country: {country}")
+
+                # SQL query to insert or update customer record
+                sql_query = f"""
+                INSERT INTO dim_customer (customer_id, country)
+                VALUES ({customer_id}, '{country}')
+                ON CONFLICT (customer_id) DO UPDATE
+                SET country = '{country}';
+                """
+
+                connection.execute(text(sql_query))
+
+            # Populate dim_product
+            products = df_cleaned[['StockCode', 'Description', 'UnitPrice']].drop_duplicates()
+            products.columns = ['product_id', 'description', 'unit_price']
+
+            for index, row in products.iterrows():
+                product_id = row['product_id']
+                description = row['description'].replace("'", "''")  # Escape single quotes
+                unit_price = row['unit_price'] / AMOUNT_SCALE
+
+                # Log every 100 rows only
+                if index % 100 == 0:
+                    print(f"Inserting product_id: {product_id}, description: {description}, unit_price: {unit_price}")
+
+                sql_query = f"""
+                INSERT INTO dim_product (product_id, description, unit_price)
+                VALUES ('{product_id}', '{description}', {unit_price})
+                ON CONFLICT (product_id) DO UPDATE
+                SET description = '{description}', unit_price = {unit_price};
+                """
+
+                connection.execute(text(sql_query))
+
+            # Populate dim_time
+            df_cleaned['InvoiceYear'] = df_cleaned['InvoiceDate'].dt.year
+            df_cleaned['InvoiceMonth'] = df_cleaned['InvoiceDate'].dt.month
+            time_dim = df_cleaned[['InvoiceDate', 'InvoiceMonth', 'InvoiceYear']].drop_duplicates()
+            time_dim.columns = ['invoice_date', 'month', 'year']
+
+            for index, row in time_dim.iterrows():
+                invoice_date = row['invoice_date']
+                month = row['month']
+                year = row['year']
+
+                # Log every 100 rows only
+                if index % 100 == 0:
+                    print(f"Inserting invoice_date: {invoice_date}, month: {month}, year: {year}")
+
+                sql_query = f"""
+                INSERT INTO dim_time (invoice_date, month, year)
+                VALUES ('{invoice_date}', {month}, {year})
+                ON CONFLICT (invoice_date) DO UPDATE
+                SET month = {month}, year = {year};
+                """
+
+                connection.execute(text(sql_query))
+
+            connection.execute(text(f"UPDATE etl_load_run SET dimensions_loaded = TRUE WHERE run_id = {run_id};"))
+        print("Dimensions committed")
+
+    # Populate fact_sales in checkpointed batches: each batch commits with its ledger entry,
+    # so a failed or interrupted run resumes after the last committed row, whatever BATCH_SIZE is
+    for batch_start in range(last_row, len(df_cleaned), BATCH_SIZE):
+        batch = df_cleaned.iloc[batch_start:batch_start + BATCH_SIZE]
+
+        with connection.begin():
+            fact_sales_rows = []
+
+            for index, row in batch.iterrows():
+                invoice_no = row['InvoiceNo']
+                customer_id = int(row['CustomerID'])
+                product_id = row['StockCode']
+                invoice_date = row['InvoiceDate']
+                quantity = row['Quantity']
+                total_amount = row['TotalAmount'] / AMOUNT_SCALE
+                occurrence = row['LineOccurrence']
+
+                # Get the time_id from dim_time based on invoice_date
+                time_query = f"SELECT time_id FROM dim_time WHERE invoice_date = '{invoice_date}'"
+                time_id = connection.execute(text(time_query)).fetchone()
+
+                if not time_id:
+                    print(f"Time ID not found for invoice_date: {invoice_date}")
+                    continue
+
+                # Check if customer and product exist in respective dimension tables
+                customer_query = f"SELECT customer_id FROM dim_customer WHERE customer_id = {customer_id}"
+                customer_result = connection.execute(text(customer_query)).fetchone()
+
+                product_query = f"SELECT product_id FROM dim_product WHERE product_id = '{product_id}'"
+                product_result = connection.execute(text(product_query)).fetchone()
+
+                if not (customer_result and product_result):
+                    print(f"Customer or Product not found for: CustomerID {customer_id}, ProductID {product_id}")
+                    continue
+
+                # Same key as the line_key backfill in SQL
+                line_key = hashlib.md5(
+                    f"{invoice_no}|{customer_id}|{product_id}|{time_id[0]}|{quantity}|{occurrence}".encode('utf-8')
+                ).hexdigest()
+
+                # Prepare the data for batch insert
+                fact_sales_rows.append(
+                    f"('{invoice_no}', {customer_id}, '{product_id}', {time_id[0]}, {quantity}, {total_amount}, '{line_key}')"
+                )
+
+            # Rows already inserted by an earlier attempt are skipped by their line_key
+            if fact_sales_rows:
+                sql_query = f"""
+                INSERT INTO fact_sales (invoice_no, customer_id, product_id, time_id, quantity, total_amount, line_key)
+                VALUES {', '.join(fact_sales_rows)}
+                ON CONFLICT (line_key) DO NOTHING;
+                """
+                connection.execute(text(sql_query))
+
+            connection.execute(text(f"UPDATE etl_load_run SET last_row = {batch_start + len(batch)} WHERE run_id = {run_id};"))
+        last_row = batch_start + len(batch)
+        print(f"Committed rows {batch_start}-{last_row} ({len(fact_sales_rows)} inserted) into fact_sales")
+
+    # Mark the run as completed
+    with connection.begin():
+        connection.execute(text(f"UPDATE etl_load_run SET status = 'completed', finished_at = NOW() WHERE run_id = {run_id};"))
     print("Data committed to the database successfully!")
 
 except Exception as e:
     print(f"Error: {str(e)}")
-    transaction.rollback()  # Rollback in case of an error
+    print(f"Run {run_id} stopped after row {last_row}; run etl.py again to resume.")
+    with connection.begin():
+        connection.execute(text(f"UPDATE etl_load_run SET status = 'failed' WHERE run_id = {run_id};"))
 
 finally:
     connection.close()